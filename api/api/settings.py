@@ -124,6 +124,20 @@ MEDIA_URL = '/media/'
 
 API_URL = 'http://localhost:8000'
 
+# Load the fuel stations and heavy modules in AppConfig.ready(). Combined with
+# `gunicorn --preload` this happens once in the master and the memory is shared
+# copy-on-write with every worker.
+# Each process still reloads the stations when the table changes, checked at
+# most every ROUTE_PLANNER_STATION_CHECK_INTERVAL seconds.
+ROUTE_PLANNER_PRELOAD = os.environ.get('ROUTE_PLANNER_PRELOAD', '0') == '1'
+ROUTE_PLANNER_STATION_CHECK_INTERVAL = 30
+
+# Routing engine: 'osrm' (HTTP server below) or 'road_graph' (offline, in process,
+# on a graph built with `manage.py build_road_graph`)
+ROUTE_PLANNER_ROUTING_BACKEND = os.environ.get('ROUTE_PLANNER_ROUTING_BACKEND', 'osrm')
+ROUTE_PLANNER_OSRM_URL = os.environ.get('ROUTE_PLANNER_OSRM_URL', 'https://router.project-osrm.org/route/v1/driving/')
+ROUTE_PLANNER_ROAD_GRAPH = os.environ.get('ROUTE_PLANNER_ROAD_GRAPH', os.path.join(BASE_DIR, 'road_graph.npz'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -0,0 +1,94 @@
+"""
+Compares route query latency of the routing backends on city pairs.
+
+    python benchmarks/routing_backends.py [--graph road_graph.npz] [--runs 3] [--skip-osrm | --skip-graph]
+
+Coordinates are fixed so geocoding is not measured, and the route cache is not
+used: every query goes to the backend (HTTP round trip for OSRM, in-process
+bidirectional A* for the road graph). Graph loading time is reported separately.
+The road graph is skipped when its file does not exist (build it with
+`manage.py build_road_graph`).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from route_planner.services.routing_backends import OSRMBackend, RoadGraphBackend  # noqa: E402
+
+CITIES = {
+    'New York': (40.7128, -74.0060),
+    'Los Angeles': (34.0522, -118.2437),
+    'Chicago': (41.8781, -87.6298),
+    'Houston': (29.7604, -95.3698),
+    'Phoenix': (33.4484, -112.0740),
+    'Denver': (39.7392, -104.9903),
+    'Atlanta': (33.7490, -84.3880),
+    'Seattle': (47.6062, -122.3321),
+    'Dallas': (32.7767, -96.7970),
+    'Miami': (25.7617, -80.1918),
+}
+
+PAIRS = [
+    ('New York', 'Los Angeles'),
+    ('Chicago', 'Houston'),
+    ('Seattle', 'Miami'),
+    ('Denver', 'Atlanta'),
+    ('Phoenix', 'Dallas'),
+    ('Chicago', 'New York'),
+]
+
+
+def measure(backend, runs):
+    latencies = []
+    for start, end in PAIRS:
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            route = backend.route(CITIES[start], CITIES[end])
+            latencies.append(time.perf_counter() - t0)
+        print(f"  {start} -> {end}: {route['distance']:.0f} miles, {len(route['shapePoints'])} points")
+    latencies.sort()
+    return latencies
+
+
+def report(name, latencies):
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name}: median {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p95 {p95 * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms over {len(latencies)} queries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--graph', default=settings.ROUTE_PLANNER_ROAD_GRAPH)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--skip-osrm', action='store_true', help="Only benchmark the local graph (offline)")
+    parser.add_argument('--skip-graph', action='store_true', help="Only benchmark the OSRM server")
+    args = parser.parse_args()
+
+    if args.skip_graph:
+        print("road_graph: skipped")
+    elif not os.path.exists(args.graph):
+        print(f"road_graph: skipped, {args.graph} does not exist (see manage.py build_road_graph)")
+    else:
+        t0 = time.perf_counter()
+        road_graph = RoadGraphBackend(args.graph)
+        print(f"road_graph: loaded {len(road_graph.graph)} nodes in {(time.perf_counter() - t0) * 1000:.0f} ms")
+        report('road_graph', measure(road_graph, args.runs))
+
+    if not args.skip_osrm:
+        osrm = OSRMBackend(settings.ROUTE_PLANNER_OSRM_URL)
+        report('osrm', measure(osrm, args.runs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Measures worker startup time and per-worker memory, with and without preloading.
+
+    python benchmarks/startup.py [--runs 5] [--workers 4]
+
+For each mode a fresh interpreter loads the WSGI application, then serves the
+equivalent of a first request (station data + map module). Memory is read from
+/proc/<pid>/smaps_rollup (Linux); Pss/Private show how much of each worker is
+really its own once the pages shared with the master are accounted for.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, os, sys, time
+
+def memory():
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            rows = dict(line.split(':', 1) for line in f.read().splitlines()[1:])
+        return {k: int(rows[k].split()[0]) for k in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty')}
+    except OSError:
+        import resource
+        return {'Rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+def first_request():
+    t = time.perf_counter()
+    from route_planner.services.station_index import get_station_index
+    from route_planner.services.map_visualizer import MapVisualizer  # noqa: F401
+    index = get_station_index()
+    # touch every station like a search does
+    sum(s.id for s in index.stations)
+    return time.perf_counter() - t
+
+t0 = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
+from api.wsgi import application  # noqa: F401
+startup = time.perf_counter() - t0
+
+workers = int(sys.argv[1])
+pipes = []
+for _ in range(workers):
+    r, w = os.pipe()
+    if os.fork() == 0:
+        os.close(r)
+        elapsed = first_request()
+        os.write(w, json.dumps({'first_request': elapsed, 'memory': memory()}).encode())
+        os._exit(0)
+    os.close(w)
+    pipes.append(r)
+
+results = []
+for r in pipes:
+    with os.fdopen(r) as f:
+        results.append(json.loads(f.read()))
+for _ in pipes:
+    os.wait()
+
+print(json.dumps({'startup': startup, 'master': memory(), 'workers': results}))
+"""
+
+
+def run(preload, workers):
+    env = dict(os.environ, ROUTE_PLANNER_PRELOAD='1' if preload else '0')
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, str(workers)],
+        cwd=API_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    for preload in (False, True):
+        samples = [run(preload, args.workers) for _ in range(args.runs)]
+        startup = [s['startup'] for s in samples]
+        first = [w['first_request'] for s in samples for w in s['workers']]
+        last = samples[-1]
+
+        print(f"preload={'on' if preload else 'off'}")
+        print(f"  master startup   median {statistics.median(startup) * 1000:8.1f} ms")
+        print(f"  first request    median {statistics.median(first) * 1000:8.1f} ms")
+        print(f"  master memory    {last['master']}")
+        for i, worker in enumerate(last['workers']):
+            print(f"  worker {i} memory {worker['memory']} (kB)")
+
+
+if __name__ == '__main__':
+    main()
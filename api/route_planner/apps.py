@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RoutePlannerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'route_planner'
+
+    def ready(self):
+        # Opt-in: load station data before a preforking server (gunicorn --preload) forks its workers
+        if getattr(settings, 'ROUTE_PLANNER_PRELOAD', False):
+            from route_planner.services.station_index import preload
+            preload()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from route_planner.services.road_graph import RoadGraph
+
+
+class Command(BaseCommand):
+    help = "Build the offline routing graph (.npz) from a GeoJSON file of road lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('geojson_file', type=str, help="Path to a GeoJSON FeatureCollection of LineStrings")
+        parser.add_argument('output', type=str, help="Path of the .npz graph to write (see ROUTE_PLANNER_ROAD_GRAPH)")
+
+    def handle(self, *args, **options):
+        graph = RoadGraph.load(options['geojson_file'])
+        graph.save(options['output'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Road graph saved to {options['output']}: {len(graph)} nodes, {len(graph.indices)} edges"
+        ))
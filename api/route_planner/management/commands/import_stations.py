@@ -1,5 +1,6 @@
 from decimal import Decimal
 import time
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from geopy.geocoders import Nominatim, ArcGIS
 from geopy.exc import GeocoderTimedOut
@@ -64,4 +65,12 @@ class Command(BaseCommand):
 
                     self.stdout.write(self.style.SUCCESS(
                         f"Station {count} imported: {station.name}"
-                    ))
\ No newline at end of file
+                    ))
+
+        # nothing is built here: serving processes notice the changed table and
+        # rebuild their station index and price tiles on their next check
+        geocoded = FuelStation.objects.filter(latitude__isnull=False, longitude__isnull=False).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"{geocoded} geocoded stations; running servers reload them within "
+            f"{settings.ROUTE_PLANNER_STATION_CHECK_INTERVAL} seconds"
+        ))
@@ -7,6 +7,17 @@ class RouteRequestSerializer(serializers.Serializer):
     end_location = serializers.CharField()
 
 
+class RouteSweepRequestSerializer(RouteRequestSerializer):
+    tank_ranges = serializers.ListField(
+        child=serializers.FloatField(min_value=100.0, max_value=2000.0),
+        min_length=1, max_length=20
+    )
+    mpgs = serializers.ListField(
+        child=serializers.FloatField(min_value=1.0, max_value=50.0),
+        min_length=1, max_length=20
+    )
+
+
 class RouteResponseSerializer(serializers.Serializer):
     route = serializers.ListField()
     fuel_stops = serializers.ListField()
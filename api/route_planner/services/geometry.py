@@ -0,0 +1,22 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_MILES = 3958.8
+
+
+def haversine_miles(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Great-circle distance in miles between points given in degrees.
+    Arguments are scalars or arrays and broadcast like numpy operands, e.g.
+    one point against arrays of points, or two aligned arrays pairwise.
+    """
+    lat1, lon1, lat2, lon2 = np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_radians(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Same distance between two points given in radians, with plain floats for use in tight loops"""
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(min(a, 1.0)))
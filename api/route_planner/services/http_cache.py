@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import json
+from typing import Dict, Optional, Tuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from route_planner.services.routing import ROUTE_CACHE_VERSION
+from route_planner.services.routing_backends import get_routing_backend
+from route_planner.services.station_index import get_station_index
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+SUPPORTED_ENCODINGS = ('identity', 'gzip', 'br') if brotli is not None else ('identity', 'gzip')
+
+# How long clients and shared caches may reuse a plan (seconds)
+PLAN_MAX_AGE = 3600
+# Compressed bodies are only kept when they save at least this many bytes
+MIN_COMPRESSION_GAIN = 256
+
+
+def normalize_location(location: str) -> str:
+    """Collapses whitespace so that equivalent queries share a cache entry"""
+    return ' '.join(location.split())
+
+
+def plan_etag(start_location: str, end_location: str) -> str:
+    """
+    Strong validator for a plan: same inputs, same stations/prices, same
+    route cache format and routing backend always produce the same response body.
+    """
+    key = json.dumps([
+        normalize_location(start_location).casefold(),
+        normalize_location(end_location).casefold(),
+        get_station_index().version,
+        ROUTE_CACHE_VERSION,
+        get_routing_backend().name,
+    ])
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def etag_header(etag: str, encoding: str) -> str:
+    """Each content-coding is a different representation and gets its own strong ETag"""
+    if encoding == 'identity':
+        return f'"{etag}"'
+    return f'"{etag}-{encoding}"'
+
+
+def matched_encodings(if_none_match: Optional[str], etag: str) -> Tuple[str, ...]:
+    """
+    Content-codings of the representations of `etag` that an If-None-Match
+    header names (every supported one for `*`), empty if it names none
+    """
+    if not if_none_match:
+        return ()
+    matched = []
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return SUPPORTED_ENCODINGS
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        for encoding in SUPPORTED_ENCODINGS:
+            if tag == etag_header(etag, encoding).strip('"') and encoding not in matched:
+                matched.append(encoding)
+    return tuple(matched)
+
+
+def encode_plan(payload: Dict) -> Dict[str, bytes]:
+    """Serializes a plan once and compresses it with every supported coding"""
+    body = json.dumps(payload, cls=DjangoJSONEncoder).encode()
+    bodies = {'identity': body}
+
+    compressed = {'gzip': gzip.compress(body, compresslevel=6)}
+    if 'br' in SUPPORTED_ENCODINGS:
+        compressed['br'] = brotli.compress(body, quality=5)
+
+    for encoding, data in compressed.items():
+        if len(body) - len(data) >= MIN_COMPRESSION_GAIN:
+            bodies[encoding] = data
+    return bodies
+
+
+def negotiate_encoding(accept_encoding: str, available) -> str:
+    """Picks the best available content-coding for an Accept-Encoding header"""
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding] = quality
+
+    best, best_quality = 'identity', 0.0
+    # ordered by preference when the client weights them equally
+    for coding in ('br', 'gzip'):
+        quality = qualities.get(coding, qualities.get('*', 0.0))
+        if coding in available and quality > best_quality:
+            best, best_quality = coding, quality
+    return best
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import uuid
 from api import settings
 import folium
@@ -13,8 +13,11 @@ class MapVisualizer:
         self.maps_directory = os.path.join(settings.MEDIA_ROOT, 'route_maps')
         Path(self.maps_directory).mkdir(parents=True, exist_ok=True)
         
-    def create_map(self) -> str:
-        """Creates an interactive map with route and fuel stops"""
+    def create_map(self, name: Optional[str] = None) -> str:
+        """
+        Creates an interactive map with route and fuel stops
+        name: fixes the file name (so the url is the same each time), random by default
+        """
         # Center the map on the first point of the route
         start_point = self.route_points[0]
         route_map = folium.Map(location=start_point, zoom_start=6)
@@ -72,11 +75,13 @@ class MapVisualizer:
         
         folium.LayerControl().add_to(route_map)
 
-        filename = f"route_map_{uuid.uuid4().hex[:8]}.html"
+        filename = f"route_map_{name or uuid.uuid4().hex[:8]}.html"
         filepath = os.path.join(self.maps_directory, filename)
         
-        # save map
-        route_map.save(filepath)
+        # save map, through a temporary file as another worker may write the same name
+        temporary_path = f"{filepath}.{uuid.uuid4().hex[:8]}.tmp"
+        route_map.save(temporary_path)
+        os.replace(temporary_path, filepath)
         
         # return map url
         return f"{settings.API_URL}/media/route_maps/{filename}"
@@ -0,0 +1,177 @@
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from route_planner.services.geometry import haversine_miles
+
+MILES_PER_DEGREE_LAT = 69.0
+
+# Side of a tile in degrees (~17 miles north-south)
+TILE_SIZE_DEG = 0.25
+# A station is dominated when a strictly cheaper one is at most this far away
+DOMINANCE_RADIUS = 5.0
+# Haversine on a sphere vs geodesic on WGS-84 differ by well under 1%
+DISTANCE_SLACK = 1.01
+
+
+@dataclass
+class PriceTile:
+    row: int
+    col: int
+    south: float
+    west: float
+    # indexes into the station index, cheapest first (ties by index)
+    stations: np.ndarray
+    # the stations that no cheaper station within DOMINANCE_RADIUS beats, same order
+    frontier: np.ndarray
+    min_price: float
+    p10_price: float
+    median_price: float
+    p90_price: float
+    max_price: float
+
+    def distance_bounds(self, lat: float, lon: float, tile_size: float) -> Tuple[float, float]:
+        """Lower and upper bound (haversine miles) of the distance from a point to anything in the tile"""
+        north, east = self.south + tile_size, self.west + tile_size
+        nearest_lat = min(max(lat, self.south), north)
+        nearest_lon = min(max(lon, self.west), east)
+        corners = haversine_miles(
+            lat, lon,
+            np.array([self.south, self.south, north, north, nearest_lat]),
+            np.array([self.west, east, self.west, east, nearest_lon]),
+        )
+        return float(corners[4]), float(corners[:4].max())
+
+    def as_dict(self, tile_size: float) -> Dict:
+        return {
+            'tile': [self.row, self.col],
+            'bounds': {
+                'south': self.south,
+                'west': self.west,
+                'north': self.south + tile_size,
+                'east': self.west + tile_size,
+            },
+            'station_count': len(self.stations),
+            'frontier_count': len(self.frontier),
+            'min_price': self.min_price,
+            'p10_price': self.p10_price,
+            'median_price': self.median_price,
+            'p90_price': self.p90_price,
+            'max_price': self.max_price,
+        }
+
+
+class PriceTiles:
+    """
+    Stations bucketed into lat/lon tiles with price summaries.
+    Lets a "cheapest station near a point" search skip tiles that are out of
+    reach or cannot beat the best price found so far, and skip dominated
+    stations in tiles that lie entirely inside the search radius.
+    """
+
+    def __init__(self, latitudes: np.ndarray, longitudes: np.ndarray, prices: np.ndarray,
+                 tile_size: float = TILE_SIZE_DEG, dominance_radius: float = DOMINANCE_RADIUS):
+        self.tile_size = tile_size
+        self.dominance_radius = dominance_radius
+        self.tiles: Dict[Tuple[int, int], PriceTile] = {}
+
+        rows = np.floor(latitudes / tile_size).astype(np.int64)
+        cols = np.floor(longitudes / tile_size).astype(np.int64)
+
+        members = {}
+        for i, key in enumerate(zip(rows.tolist(), cols.tolist())):
+            members.setdefault(key, []).append(i)
+
+        for (row, col), indexes in members.items():
+            indexes = np.array(indexes, dtype=np.int64)
+            # cheapest first, lowest index first on equal prices
+            indexes = indexes[np.lexsort((indexes, prices[indexes]))]
+            tile_prices = prices[indexes]
+            p10, median, p90 = np.percentile(tile_prices, [10, 50, 90]).tolist()
+
+            self.tiles[(row, col)] = PriceTile(
+                row=row,
+                col=col,
+                south=row * tile_size,
+                west=col * tile_size,
+                stations=indexes,
+                frontier=indexes,
+                min_price=float(tile_prices[0]),
+                p10_price=p10,
+                median_price=median,
+                p90_price=p90,
+                max_price=float(tile_prices[-1]),
+            )
+
+        for tile in self.tiles.values():
+            tile.frontier = self._non_dominated(tile, latitudes, longitudes, prices)
+
+    def _neighbour_span(self, lat: float, radius: float) -> Tuple[int, int]:
+        """How many tiles around a point (rows, cols) a radius can reach"""
+        rows = math.ceil(radius / (MILES_PER_DEGREE_LAT * self.tile_size))
+        cos_lat = max(math.cos(math.radians(min(abs(lat) + self.tile_size, 89.0))), 0.01)
+        cols = math.ceil(radius / (MILES_PER_DEGREE_LAT * cos_lat * self.tile_size))
+        return rows, cols
+
+    def _non_dominated(self, tile: PriceTile, latitudes, longitudes, prices) -> np.ndarray:
+        rows, cols = self._neighbour_span(tile.south, self.dominance_radius * DISTANCE_SLACK)
+        neighbours = [
+            self.tiles[(r, c)].stations
+            for r in range(tile.row - rows, tile.row + rows + 1)
+            for c in range(tile.col - cols, tile.col + cols + 1)
+            if (r, c) in self.tiles
+        ]
+        neighbours = np.concatenate(neighbours)
+        neighbour_prices = prices[neighbours]
+
+        keep = []
+        for i in tile.stations.tolist():
+            cheaper = neighbours[neighbour_prices < prices[i]]
+            if len(cheaper) and (
+                haversine_miles(latitudes[i], longitudes[i], latitudes[cheaper], longitudes[cheaper])
+                <= self.dominance_radius
+            ).any():
+                continue
+            keep.append(i)
+        return np.array(keep, dtype=np.int64)
+
+    def candidates(self, lat: float, lon: float, radius: float) -> Iterator[Tuple[PriceTile, np.ndarray]]:
+        """
+        Tiles that may hold the cheapest station within `radius` miles of a point,
+        by increasing min price, with the station indexes worth checking in each.
+        Callers should stop as soon as a tile's min price exceeds their best price.
+        """
+        rows, cols = self._neighbour_span(lat, radius * DISTANCE_SLACK)
+        row, col = math.floor(lat / self.tile_size), math.floor(lon / self.tile_size)
+
+        reachable: List[Tuple[PriceTile, bool]] = []
+        for r in range(row - rows, row + rows + 1):
+            for c in range(col - cols, col + cols + 1):
+                tile = self.tiles.get((r, c))
+                if tile is None:
+                    continue
+                nearest, farthest = tile.distance_bounds(lat, lon, self.tile_size)
+                # 1 mile of margin: clamping to the box is not exactly its nearest point
+                if nearest / DISTANCE_SLACK > radius + 1.0:
+                    continue
+                # every station of the tile is within radius - dominance radius, so
+                # a dominated one always has a cheaper station within radius
+                inside = (farthest + self.dominance_radius) * DISTANCE_SLACK <= radius
+                reachable.append((tile, inside))
+
+        reachable.sort(key=lambda item: item[0].min_price)
+        for tile, inside in reachable:
+            yield tile, (tile.frontier if inside else tile.stations)
+
+    def stats(self) -> Dict:
+        tiles = sorted(self.tiles.values(), key=lambda t: (t.row, t.col))
+        return {
+            'tile_size': self.tile_size,
+            'dominance_radius': self.dominance_radius,
+            'tile_count': len(tiles),
+            'station_count': sum(len(t.stations) for t in tiles),
+            'frontier_count': sum(len(t.frontier) for t in tiles),
+            'tiles': [t.as_dict(self.tile_size) for t in tiles],
+        }
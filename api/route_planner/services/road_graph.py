@@ -0,0 +1,181 @@
+import heapq
+import json
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+from route_planner.services.geometry import haversine_miles, haversine_radians
+
+
+class RoadGraph:
+    """
+    Directed road network held in compressed sparse row arrays:
+    the edges leaving node v are indices[indptr[v]:indptr[v + 1]], with their
+    lengths in miles in the same slots of `lengths`. A reversed copy is kept for
+    the backward half of the bidirectional search.
+    """
+
+    def __init__(self, latitudes: np.ndarray, longitudes: np.ndarray, indptr: np.ndarray, indices: np.ndarray, lengths: np.ndarray):
+        self.latitudes = np.ascontiguousarray(latitudes, dtype=np.float64)
+        self.longitudes = np.ascontiguousarray(longitudes, dtype=np.float64)
+        self.indptr = np.ascontiguousarray(indptr, dtype=np.int64)
+        self.indices = np.ascontiguousarray(indices, dtype=np.int32)
+        self.lengths = np.ascontiguousarray(lengths, dtype=np.float64)
+
+        sources = np.repeat(np.arange(len(self.latitudes), dtype=np.int32), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind='stable')
+        self.reverse_indptr = np.concatenate(([0], np.cumsum(np.bincount(self.indices, minlength=len(self.latitudes)))))
+        self.reverse_indices = sources[order]
+        self.reverse_lengths = self.lengths[order]
+
+        self._lat_radians = np.radians(self.latitudes)
+        self._lon_radians = np.radians(self.longitudes)
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    @classmethod
+    def load(cls, path: str) -> 'RoadGraph':
+        """Loads a graph saved with `save`, or builds one from a GeoJSON file of road lines"""
+        if path.endswith('.npz'):
+            with np.load(path) as data:
+                return cls(data['latitudes'], data['longitudes'], data['indptr'], data['indices'], data['lengths'])
+        with open(path) as file:
+            return cls.from_geojson(json.load(file))
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            latitudes=self.latitudes,
+            longitudes=self.longitudes,
+            indptr=self.indptr,
+            indices=self.indices,
+            lengths=self.lengths,
+        )
+
+    @classmethod
+    def from_geojson(cls, collection: dict) -> 'RoadGraph':
+        """
+        Builds a graph from LineString/MultiLineString features (e.g. an export of
+        interstate and US highways). Coordinates are snapped to a grid of 6
+        decimals (~0.1 m) and vertices that snap to the same point become one
+        node, so roads sharing a vertex are connected. Close vertices on either
+        side of a grid line stay separate nodes. Roads are two-way unless the
+        feature has a truthy `oneway` property.
+        """
+        nodes = {}
+        edges = []
+
+        def node(coordinate):
+            key = (round(coordinate[1], 6), round(coordinate[0], 6))
+            if key not in nodes:
+                nodes[key] = len(nodes)
+            return nodes[key]
+
+        for feature in collection.get('features', []):
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') == 'LineString':
+                lines = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiLineString':
+                lines = geometry['coordinates']
+            else:
+                continue
+            oneway = bool((feature.get('properties') or {}).get('oneway'))
+
+            for line in lines:
+                for a, b in zip(line, line[1:]):
+                    u, v = node(a), node(b)
+                    if u == v:
+                        continue
+                    edges.append((u, v))
+                    if not oneway:
+                        edges.append((v, u))
+
+        coordinates = np.array(list(nodes.keys()), dtype=np.float64).reshape(-1, 2)
+        latitudes, longitudes = coordinates[:, 0], coordinates[:, 1]
+
+        edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+        edges = edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+        sources, targets = edges[:, 0], edges[:, 1]
+
+        lengths = haversine_miles(latitudes[sources], longitudes[sources], latitudes[targets], longitudes[targets])
+
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(sources, minlength=len(latitudes)))))
+        return cls(latitudes, longitudes, indptr, targets, lengths)
+
+    def nearest_node(self, lat: float, lon: float) -> Tuple[int, float]:
+        """Closest node to a point and its distance in miles"""
+        distances = haversine_miles(lat, lon, self.latitudes, self.longitudes)
+        node = int(np.argmin(distances))
+        return node, float(distances[node])
+
+    def shortest_path(self, source: int, target: int) -> Tuple[float, List[int]]:
+        """
+        Bidirectional A* between two nodes, returns (length in miles, nodes).
+        Both searches use the average of the straight-line distance potentials,
+        which keeps them consistent so the usual "top_f + top_r >= best" stop holds.
+        Raises ValueError if target cannot be reached.
+        """
+        if source == target:
+            return 0.0, [source]
+
+        # memoryviews index into the arrays without copying and yield Python scalars
+        lat, lon = memoryview(self._lat_radians), memoryview(self._lon_radians)
+        s_lat, s_lon, t_lat, t_lon = lat[source], lon[source], lat[target], lon[target]
+        potentials = {}
+
+        def potential(v):
+            if v not in potentials:
+                potentials[v] = (haversine_radians(lat[v], lon[v], t_lat, t_lon) - haversine_radians(lat[v], lon[v], s_lat, s_lon)) / 2
+            return potentials[v]
+
+        searches = (
+            # (adjacency, distances, parents, heap, settled, sign of the potential)
+            (memoryview(self.indptr), memoryview(self.indices), memoryview(self.lengths),
+             {source: 0.0}, {source: -1}, [(potential(source), source)], set(), 1),
+            (memoryview(self.reverse_indptr), memoryview(self.reverse_indices), memoryview(self.reverse_lengths),
+             {target: 0.0}, {target: -1}, [(-potential(target), target)], set(), -1),
+        )
+        best, meeting = math.inf, -1
+
+        while searches[0][5] and searches[1][5]:
+            if searches[0][5][0][0] + searches[1][5][0][0] >= best:
+                break
+
+            # grow the side with the smaller frontier key
+            side = 0 if searches[0][5][0][0] <= searches[1][5][0][0] else 1
+            indptr, indices, lengths, distances, parents, heap, settled, sign = searches[side]
+            other_distances = searches[1 - side][3]
+
+            _, v = heapq.heappop(heap)
+            if v in settled:
+                continue
+            settled.add(v)
+
+            distance_v = distances[v]
+            for slot in range(indptr[v], indptr[v + 1]):
+                w = indices[slot]
+                distance_w = distance_v + lengths[slot]
+                if distance_w < distances.get(w, math.inf):
+                    distances[w] = distance_w
+                    parents[w] = v
+                    heapq.heappush(heap, (distance_w + sign * potential(w), w))
+                    if w in other_distances and distance_w + other_distances[w] < best:
+                        best, meeting = distance_w + other_distances[w], w
+
+        if meeting < 0:
+            raise ValueError("No road connects these locations")
+
+        forward_parents, backward_parents = searches[0][4], searches[1][4]
+        path = []
+        v = meeting
+        while v != -1:
+            path.append(v)
+            v = forward_parents[v]
+        path.reverse()
+        v = backward_parents[meeting]
+        while v != -1:
+            path.append(v)
+            v = backward_parents[v]
+        return best, path
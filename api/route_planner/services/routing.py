@@ -1,13 +1,13 @@
 from decimal import Decimal
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from django.core.cache import cache
-from route_planner.services.map_visualizer import MapVisualizer
-from geopy.geocoders import Nominatim, ArcGIS
-from geopy.distance import geodesic, Distance
-import requests
 from route_planner.serializers import FuelStationSerializer
 from route_planner.dtos.station_with_distance import StationWithDistance
-from route_planner.models import FuelStation
+from route_planner.services.routing_backends import get_routing_backend
+from route_planner.services.station_index import get_station_index
+
+# Bump when the format of cached routes changes, it also invalidates plan ETags
+ROUTE_CACHE_VERSION = 1
 
 
 class RoutePlanner:
@@ -21,8 +21,16 @@ class RoutePlanner:
         self.end = end_location
         self.tank_range = tank_range
         self.mpg = mpg
-        self.OSRM_API_URL = "https://router.project-osrm.org/route/v1/driving/"
-        self.geocoder = ArcGIS(timeout=10)
+        self.routing_backend = get_routing_backend()
+        self._geocoder = None
+
+    @property
+    def geocoder(self):
+        # geopy is only needed on a cache miss, import it then
+        if self._geocoder is None:
+            from geopy.geocoders import ArcGIS
+            self._geocoder = ArcGIS(timeout=10)
+        return self._geocoder
 
 
     def get_coordinates(self, location:str) -> Tuple[float, float]:
@@ -48,12 +56,13 @@ class RoutePlanner:
 
     def calculate_distance(self, point1: Tuple[float, float], point2:Tuple[float, float],) -> float:
         """Calculate distance between two points in miles using geopy"""
+        from geopy.distance import geodesic
         return geodesic(point1, point2).miles
     
 
     def get_route(self) -> Dict:
-        """Get route using OSRM"""
-        cache_key = f"route_{self.start}_{self.end}"
+        """Get route using the configured routing backend"""
+        cache_key = f"route_v{ROUTE_CACHE_VERSION}_{self.routing_backend.name}_{self.start}_{self.end}"
         cached_route = cache.get(cache_key)
 
         if cached_route:
@@ -61,31 +70,13 @@ class RoutePlanner:
         
         start_coords = self.get_coordinates(self.start)
         end_coords = self.get_coordinates(self.end)
+        route = self.routing_backend.route(start_coords, end_coords)
 
-        url = f"{self.OSRM_API_URL}{start_coords[1]},{start_coords[0]};{end_coords[1]},{end_coords[0]}"
-        params = {
-            'overview': 'full',
-            'geometries': 'geojson',
-            'steps': 'false'
-        }
-
-        response = requests.get(url, params=params)
-        route_data = response.json()
-
-        if route_data.get('code') != 'Ok':
-            raise ValueError("Error retrieving route")
-        
-        distance_meters = route_data['routes'][0]['distance']
-        distance = Distance(meters=distance_meters).miles
-        
         processed_route = {
             'route': {
-                'distance': distance,
+                'distance': route['distance'],
                 'shape': {
-                    'shapePoints': [
-                        (coord[1], coord[0])
-                        for coord in route_data['routes'][0]['geometry']['coordinates']
-                    ]
+                    'shapePoints': route['shapePoints']
                 }
             }
         }
@@ -94,84 +85,104 @@ class RoutePlanner:
 
         return processed_route
 
-    def find_stations_near_route(self, route_points: List[Tuple[float, float]], route_distance: float, max_distance: float = 30.0) -> List[StationWithDistance]:
+    def route_segment_distances(self, route_points: List[Tuple[float, float]]) -> List[float]:
+        """Length in miles of each segment of the route"""
+        return [
+            self.calculate_distance(route_points[i-1], route_points[i])
+            for i in range(1, len(route_points))
+        ]
+
+    def refuel_points(self, segment_distances: List[float], route_distance: float) -> List[Tuple[int, float]]:
         """
-        Find optimal gas stations near route when vehicle needs refueling (tank range = 500 miles)
-        Returns stations close to points where remaining range gets low
+        Route points where remaining range gets low, as (index in route_points, distance from start)
         """
-        stations_near_route = []
-        all_stations = FuelStation.objects.all()
+        points = []
         current_distance = 0
         current_distance_from_start = 0
-        
+
         # Calculate cumulative distance along route until we approach tank range
-        for i in range(1, len(route_points)):
-            segment_distance = self.calculate_distance(route_points[i-1], route_points[i])
+        for i, segment_distance in enumerate(segment_distances, start=1):
             current_distance += segment_distance
             current_distance_from_start += segment_distance # the distance from start to current_point
-            
+
             # When we get close to tank range limit (e.g. within 50 miles), look for stations if the route distance is great than the tank_range
             if current_distance >= (self.tank_range - 50) and route_distance > self.tank_range:  # Start looking before completely empty
-                target_point = route_points[i]
-                nearby_stations = []
-                
-                # Find all stations near this point
-                for station in all_stations:
-                    distance_to_station = self.calculate_distance(target_point, 
-                                                            (station.latitude, station.longitude))
-                    
-                    if distance_to_station <= max_distance:
-                        total_distance = current_distance_from_start + distance_to_station
-                        station_with_distance = StationWithDistance(
-                            station=station,
-                            distance_from_start=total_distance
-                        )
-                        nearby_stations.append(station_with_distance)
-                
-             
-                # Sort by price and get best option
-                if nearby_stations:
-                    nearby_stations.sort(key=lambda s: s.retail_price)
-                    best_station = nearby_stations[0]
-                    stations_near_route.append(best_station)
+                points.append((i, current_distance_from_start))
 
                 # Reset distance counter from this new refueling point
                 current_distance = 0
-        
+
+        return points
+
+    def best_station_near(self, target_point: Tuple[float, float], distance_from_start: float, max_distance: float = 30.0) -> Optional[StationWithDistance]:
+        """Cheapest station within max_distance miles of target_point (lowest id on ties), None if there is none"""
+        station_index = get_station_index()
+        latitudes, longitudes, prices = station_index.latitudes, station_index.longitudes, station_index.prices
+        best = None  # (price, index, distance)
+
+        # Tiles come cheapest first and their stations are sorted by price, so the
+        # first station in range of a tile is its best and most tiles are never opened
+        for tile, candidates in station_index.tiles.candidates(target_point[0], target_point[1], max_distance):
+            if best and tile.min_price > best[0]:
+                break
+
+            for i in candidates.tolist():
+                if best and (prices[i], i) >= best[:2]:
+                    break
+                distance_to_station = self.calculate_distance(target_point, (latitudes[i], longitudes[i]))
+                if distance_to_station <= max_distance:
+                    best = (prices[i], i, distance_to_station)
+                    break
+
+        if best is None:
+            return None
+        return StationWithDistance(
+            station=station_index.stations[best[1]],
+            distance_from_start=distance_from_start + best[2]
+        )
+
+    def find_stations_near_route(self, route_points: List[Tuple[float, float]], route_distance: float, max_distance: float = 30.0) -> List[StationWithDistance]:
+        """
+        Find optimal gas stations near route when vehicle needs refueling (tank range = 500 miles)
+        Returns stations close to points where remaining range gets low
+        """
+        stations_near_route = []
+        segment_distances = self.route_segment_distances(route_points)
+
+        for index, distance_from_start in self.refuel_points(segment_distances, route_distance):
+            best_station = self.best_station_near(route_points[index], distance_from_start, max_distance)
+            if best_station:
+                stations_near_route.append(best_station)
+
         return stations_near_route
-    
-    
-    def optimize_fuel_stops(self, route_distance: float, stations: List[StationWithDistance]) -> List[Dict]:
-        """Calculate optimal fuel stops (all distances in miles)"""
+
+
+    def plan_fuel_legs(self, route_distance: float, stations: List[StationWithDistance]) -> List[Dict]:
+        """
+        Choose where to refuel (all distances in miles).
+        Each leg records how many miles of driving are bought at its station, so the
+        plan does not depend on mpg: fuel is miles / mpg for any vehicle.
+        """
         current_range = self.tank_range
         total_distance = 0
-        optimal_stops = []
+        legs = []
         current_position = 0
 
         while total_distance < route_distance:
             remaining_distance = route_distance - total_distance
             if remaining_distance <= current_range:
-                if len(optimal_stops) > 0:
-                    
-                    last_station = optimal_stops[-1]
-                    last_station['fuel_for_finish'] = remaining_distance / self.mpg
-                    last_station['total_fuel'] = last_station['fuel_needed']
-                    last_station['cost'] = (
-                        Decimal(str(last_station['total_fuel'] + last_station['fuel_for_finish'])) * 
-                        Decimal(str(last_station['station']['retail_price']))
-                    ).quantize(Decimal('0.01'))
+                if len(legs) > 0:
+                    legs[-1]['miles_for_finish'] = remaining_distance
                 break
-            
+
             reachable_stations = [
                 station for station in stations
                 if station.distance_from_start <= current_position + current_range
                 and station.distance_from_start > current_position
             ]
 
-         
+            if not reachable_stations:
 
-            if not reachable_stations:  
-                
                 """
                 NOTICE: sometimes there are situations where there is no station 
                 close to the road for a given interval, taking into account the 
@@ -181,47 +192,58 @@ class RoutePlanner:
                 there is no nearby station onto the one taken from the previous station 
                 found.
                 """
-                
+
                 # get the fuel needed based on car's range
-                if len(optimal_stops) > 0:
-                    fuel_needed = self.tank_range / self.mpg
-                    last_station = optimal_stops[-1]
-                    last_station['fuel_needed'] += fuel_needed
-                    last_station['total_fuel'] = last_station['fuel_needed']
-                    last_station['cost'] = (
-                        Decimal(str(last_station['total_fuel'])) * 
-                        Decimal(str(last_station['station']['retail_price']))
-                    ).quantize(Decimal('0.01'))
-                    
+                if len(legs) > 0:
+                    legs[-1]['miles_needed'] += self.tank_range
+
                 # Because we don't find any station on the current_range, 
                 # we add the tank_range to the total_distance and current_position      
                 total_distance += self.tank_range
                 current_position += self.tank_range
-                current_range = self.tank_range   
+                current_range = self.tank_range
                 continue
-            
+
             # we get the lowest cheap and near station
             best_station = min(
                 reachable_stations,
                 key= lambda s: float(s.retail_price) * (1 + ((s.distance_from_start - current_position) / self.tank_range))
             )
 
-            if best_station:
-                # calculate the fuel to load to reach this station from the previous station or from the start
-                fuel_needed = (best_station.distance_from_start - current_position) / self.mpg 
-                
-                optimal_stops.append({
-                    'station': FuelStationSerializer(best_station.station).data,
-                    'distance_from_start': best_station.distance_from_start,
-                    'fuel_needed': fuel_needed,
-                    'total_fuel': fuel_needed,  
-                    'cost': (Decimal(str(fuel_needed)) * Decimal(str(best_station.retail_price))).quantize(Decimal('0.01'))
-                })
+            # the fuel to load to reach this station from the previous station or from the start
+            legs.append({
+                'station': best_station,
+                'miles_needed': best_station.distance_from_start - current_position,
+            })
 
             total_distance += best_station.distance_from_start - current_position
             current_position = best_station.distance_from_start
             current_range = self.tank_range
 
+        return legs
+
+    def optimize_fuel_stops(self, route_distance: float, stations: List[StationWithDistance]) -> List[Dict]:
+        """Calculate optimal fuel stops (all distances in miles)"""
+        optimal_stops = []
+
+        for leg in self.plan_fuel_legs(route_distance, stations):
+            fuel_needed = leg['miles_needed'] / self.mpg
+            # the last station also sells the fuel needed to finish the route
+            fuel_for_finish = leg.get('miles_for_finish', 0) / self.mpg
+            stop = {
+                'station': FuelStationSerializer(leg['station'].station).data,
+                'distance_from_start': leg['station'].distance_from_start,
+                'fuel_needed': fuel_needed,
+                'total_fuel': fuel_needed,
+                'cost': (
+                    Decimal(str(fuel_needed + fuel_for_finish)) *
+                    Decimal(str(leg['station'].retail_price))
+                ).quantize(Decimal('0.01'))
+            }
+            if 'miles_for_finish' in leg:
+                stop['fuel_for_finish'] = fuel_for_finish
+            optimal_stops.append(stop)
+
         return optimal_stops
     
 
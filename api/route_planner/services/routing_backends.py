@@ -0,0 +1,98 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Tuple
+
+from django.conf import settings
+
+
+class RoutingBackend(ABC):
+    """
+    Computes the driving route between two (lat, lon) points.
+    `route` returns {'distance': miles, 'shapePoints': [(lat, lon), ...]}.
+    """
+    # part of the route cache key and of plan ETags, routes differ between backends
+    name = None
+
+    @abstractmethod
+    def route(self, start_coords: Tuple[float, float], end_coords: Tuple[float, float]) -> Dict:
+        pass
+
+
+class OSRMBackend(RoutingBackend):
+    """Routes with an OSRM HTTP server"""
+    name = 'osrm'
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def route(self, start_coords: Tuple[float, float], end_coords: Tuple[float, float]) -> Dict:
+        import requests
+        from geopy.distance import Distance
+
+        url = f"{self.url}{start_coords[1]},{start_coords[0]};{end_coords[1]},{end_coords[0]}"
+        params = {
+            'overview': 'full',
+            'geometries': 'geojson',
+            'steps': 'false'
+        }
+
+        response = requests.get(url, params=params, timeout=30)
+        route_data = response.json()
+
+        if route_data.get('code') != 'Ok':
+            raise ValueError("Error retrieving route")
+
+        distance_meters = route_data['routes'][0]['distance']
+        return {
+            'distance': Distance(meters=distance_meters).miles,
+            'shapePoints': [
+                (coord[1], coord[0])
+                for coord in route_data['routes'][0]['geometry']['coordinates']
+            ]
+        }
+
+
+class RoadGraphBackend(RoutingBackend):
+    """Routes offline on a road graph loaded in memory (see RoadGraph)"""
+    name = 'road_graph'
+
+    def __init__(self, path: str):
+        from route_planner.services.road_graph import RoadGraph
+        self.graph = RoadGraph.load(path)
+
+    def route(self, start_coords: Tuple[float, float], end_coords: Tuple[float, float]) -> Dict:
+        source, start_gap = self.graph.nearest_node(*start_coords)
+        target, end_gap = self.graph.nearest_node(*end_coords)
+        distance, path = self.graph.shortest_path(source, target)
+
+        shape_points = [tuple(start_coords)]
+        shape_points += zip(self.graph.latitudes[path].tolist(), self.graph.longitudes[path].tolist())
+        shape_points.append(tuple(end_coords))
+
+        return {
+            # the legs between the locations and the network count too
+            'distance': start_gap + distance + end_gap,
+            'shapePoints': shape_points,
+        }
+
+
+_backend = None
+_lock = threading.Lock()
+
+
+def get_routing_backend() -> RoutingBackend:
+    """Returns the backend selected by ROUTE_PLANNER_ROUTING_BACKEND, created once per process"""
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = create_routing_backend(settings.ROUTE_PLANNER_ROUTING_BACKEND)
+    return _backend
+
+
+def create_routing_backend(name: str) -> RoutingBackend:
+    if name == OSRMBackend.name:
+        return OSRMBackend(settings.ROUTE_PLANNER_OSRM_URL)
+    if name == RoadGraphBackend.name:
+        return RoadGraphBackend(settings.ROUTE_PLANNER_ROAD_GRAPH)
+    raise ValueError(f"Unknown routing backend: {name}")
@@ -0,0 +1,161 @@
+import gc
+import hashlib
+import logging
+import threading
+import time
+import zipfile
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Count, Max, Sum
+
+from route_planner.models import FuelStation
+from route_planner.services.price_tiles import PriceTiles
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StationIndex:
+    """
+    In-memory copy of the fuel station table.
+    Coordinates and prices are kept in numpy arrays (aligned with `stations`) so
+    that they live in a few large buffers which stay shared between forked workers.
+    """
+    stations: List[FuelStation]
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    prices: np.ndarray
+    tiles: PriceTiles
+    version: str
+    fingerprint: Tuple
+
+    def __len__(self):
+        return len(self.stations)
+
+
+_index = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _geocoded_stations():
+    return FuelStation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+
+
+def station_fingerprint() -> Tuple:
+    """
+    Cheap summary of the station table: changes when stations are added,
+    removed, repriced or moved (e.g. re-geocoded or fixed in the admin)
+    """
+    summary = _geocoded_stations().aggregate(
+        count=Count('id'),
+        max_id=Max('id'),
+        prices=Sum('retail_price'),
+        latitudes=Sum('latitude'),
+        longitudes=Sum('longitude'),
+    )
+    return (
+        summary['count'],
+        summary['max_id'],
+        str(summary['prices']),
+        str(summary['latitudes']),
+        str(summary['longitudes']),
+    )
+
+
+def build_station_index() -> StationIndex:
+    """Loads every geocoded station from the database and precomputes its price tiles"""
+    # taken first: a change made while loading is seen by the next check
+    fingerprint = station_fingerprint()
+    stations = list(_geocoded_stations().order_by('id'))
+
+    digest = hashlib.sha1()
+    for station in stations:
+        digest.update(f"{station.id}:{station.retail_price}:{station.latitude},{station.longitude};".encode())
+
+    latitudes = np.array([float(s.latitude) for s in stations], dtype=np.float64)
+    longitudes = np.array([float(s.longitude) for s in stations], dtype=np.float64)
+    prices = np.array([float(s.retail_price) for s in stations], dtype=np.float64)
+
+    return StationIndex(
+        stations=stations,
+        latitudes=latitudes,
+        longitudes=longitudes,
+        prices=prices,
+        tiles=PriceTiles(latitudes, longitudes, prices),
+        version=digest.hexdigest()[:12],
+        fingerprint=fingerprint,
+    )
+
+
+def get_station_index() -> StationIndex:
+    """
+    Returns the process-wide station index, loading it on first use.
+    At most every ROUTE_PLANNER_STATION_CHECK_INTERVAL seconds the table
+    fingerprint is compared with the loaded one and the index (with its tiles)
+    is rebuilt if the stations changed, e.g. after `manage.py import_stations`.
+    """
+    global _index, _checked_at
+    interval = settings.ROUTE_PLANNER_STATION_CHECK_INTERVAL
+    if _index is not None and time.monotonic() - _checked_at < interval:
+        return _index
+
+    with _lock:
+        if _index is None or (
+            time.monotonic() - _checked_at >= interval
+            and station_fingerprint() != _index.fingerprint
+        ):
+            _index = build_station_index()
+        _checked_at = time.monotonic()
+        return _index
+
+
+def reset_station_index():
+    """Drops the loaded index so that the next call reloads it"""
+    global _index
+    with _lock:
+        _index = None
+
+
+def preload():
+    """
+    Warms the process before workers are forked: loads the station index and
+    the routing backend, and imports the modules that requests otherwise import lazily.
+    Meant to run once in the server master (see ROUTE_PLANNER_PRELOAD).
+    Workers still reload the stations when the table changes (see
+    get_station_index); a reloaded index is private to the worker that built it.
+    """
+    try:
+        index = get_station_index()
+    except DatabaseError as e:
+        # e.g. `migrate` has not been run yet
+        logger.warning("Station preload skipped: %s", e)
+        return
+
+    import geopy.distance  # noqa: F401
+    import geopy.geocoders  # noqa: F401
+    import requests  # noqa: F401
+    import route_planner.services.map_visualizer  # noqa: F401
+
+    # a local road graph is the other large read-only structure worth sharing
+    from route_planner.services.routing_backends import get_routing_backend
+    try:
+        get_routing_backend()
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        # e.g. the graph has not been built yet: `manage.py build_road_graph` must
+        # still start, and requests report the error when they need a route
+        logger.warning("Routing backend preload skipped: %s", e)
+
+    # A connection opened in the master must not be shared with the forked workers
+    connections.close_all()
+
+    # Move everything loaded so far out of the GC's reach: collections in the
+    # workers would otherwise touch these objects and un-share their pages.
+    gc.collect()
+    gc.freeze()
+
+    logger.info("Preloaded %d fuel stations (version %s)", len(index), index.version)
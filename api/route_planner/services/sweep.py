@@ -0,0 +1,100 @@
+from decimal import Decimal
+from typing import Dict, Sequence
+
+import numpy as np
+
+from route_planner.serializers import FuelStationSerializer
+from route_planner.services.routing import RoutePlanner
+
+
+class FuelPlanSweep:
+    """
+    Compares vehicle configurations on the same trip.
+    The route, its segment lengths and the station searches are done once; the
+    only per-scenario work is choosing the stops (which depends on tank range
+    alone) and pricing them, which is vectorized over every mpg at once.
+    """
+
+    def __init__(self, start_location: str, end_location: str, tank_ranges: Sequence[float], mpgs: Sequence[float], max_distance: float = 30.0):
+        self.start = start_location
+        self.end = end_location
+        self.tank_ranges = list(tank_ranges)
+        self.mpgs = np.asarray(mpgs, dtype=np.float64)
+        self.max_distance = max_distance
+
+    def run(self) -> Dict:
+        planner = RoutePlanner(self.start, self.end)
+        route_data = planner.get_route()
+        route_points = route_data['route']['shape']['shapePoints']
+        total_distance = route_data['route']['distance']
+        segment_distances = planner.route_segment_distances(route_points)
+
+        # several tank ranges often look for fuel around the same route points
+        nearby_stations = {}
+        serialized_stations = {}
+
+        cost_cents = np.zeros((len(self.tank_ranges), len(self.mpgs)), dtype=np.int64)
+        scenarios = []
+
+        for row, tank_range in enumerate(self.tank_ranges):
+            planner.tank_range = tank_range
+
+            stations = []
+            for index, distance_from_start in planner.refuel_points(segment_distances, total_distance):
+                if index not in nearby_stations:
+                    nearby_stations[index] = planner.best_station_near(route_points[index], distance_from_start, self.max_distance)
+                if nearby_stations[index]:
+                    stations.append(nearby_stations[index])
+
+            legs = planner.plan_fuel_legs(total_distance, stations)
+
+            # (stops x mpgs) gallons bought at each stop, priced in integer cents
+            miles = np.array([leg['miles_needed'] for leg in legs], dtype=np.float64)
+            finish_miles = np.array([leg.get('miles_for_finish', 0.0) for leg in legs], dtype=np.float64)
+            price_cents = np.array([float(leg['station'].retail_price) * 100 for leg in legs], dtype=np.float64)
+
+            fuel_needed = miles[:, None] / self.mpgs[None, :]
+            fuel_for_finish = finish_miles[:, None] / self.mpgs[None, :]
+            stop_cents = np.rint((fuel_needed + fuel_for_finish) * price_cents[:, None]).astype(np.int64)
+            cost_cents[row] = stop_cents.sum(axis=0)
+
+            for column, mpg in enumerate(self.mpgs.tolist()):
+                scenarios.append({
+                    'tank_range': tank_range,
+                    'mpg': mpg,
+                    'total_cost': self._dollars(cost_cents[row, column]),
+                    'fuel_stops': [
+                        self._stop(leg, fuel_needed[i, column], fuel_for_finish[i, column], stop_cents[i, column], serialized_stations)
+                        for i, leg in enumerate(legs)
+                    ],
+                })
+
+        return {
+            'distance': total_distance,
+            'tank_ranges': self.tank_ranges,
+            'mpgs': self.mpgs.tolist(),
+            'total_cost': [[self._dollars(cents) for cents in row] for row in cost_cents],
+            'scenarios': scenarios,
+        }
+
+    @staticmethod
+    def _dollars(cents) -> Decimal:
+        return Decimal(int(cents)).scaleb(-2)
+
+    def _stop(self, leg: Dict, fuel_needed: float, fuel_for_finish: float, cents: int, serialized_stations: Dict) -> Dict:
+        """Same keys as the stops of RoutePlanner.optimize_fuel_stops"""
+        station = leg['station']
+        if station.id not in serialized_stations:
+            serialized_stations[station.id] = FuelStationSerializer(station.station).data
+
+        stop = {
+            'station': serialized_stations[station.id],
+            'distance_from_start': station.distance_from_start,
+            'fuel_needed': float(fuel_needed),
+            'total_fuel': float(fuel_needed),
+            'cost': self._dollars(cents),
+        }
+        if 'miles_for_finish' in leg:
+            stop['fuel_for_finish'] = float(fuel_for_finish)
+        return stop
+
@@ -1,3 +1,634 @@
-from django.test import TestCase
+import gzip
+import heapq
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from geopy.distance import geodesic
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from route_planner.models import FuelStation
+from route_planner.services import http_cache, routing_backends, station_index
+from route_planner.services.road_graph import RoadGraph
+from route_planner.services.routing import RoutePlanner
+from route_planner.services.routing_backends import RoadGraphBackend, RoutingBackend
+from route_planner.services.sweep import FuelPlanSweep
+
+
+def make_station(pk, latitude, longitude, price, save=False):
+    station = FuelStation(
+        id=pk,
+        opis_id=pk,
+        name=f"Station {pk}",
+        address="1 Main St",
+        city="Town",
+        state="TX",
+        rack_id=1,
+        retail_price=Decimal(str(price)),
+        latitude=Decimal(str(latitude)),
+        longitude=Decimal(str(longitude)),
+    )
+    if save:
+        station.save()
+    return station
+
+
+class StationIndexReloadTests(TestCase):
+    def setUp(self):
+        station_index.reset_station_index()
+        self.addCleanup(station_index.reset_station_index)
+        make_station(1, 35.0, -100.0, 3.50, save=True)
+
+    def test_index_is_kept_while_the_table_is_unchanged(self):
+        with override_settings(ROUTE_PLANNER_STATION_CHECK_INTERVAL=0):
+            first = station_index.get_station_index()
+            self.assertIs(station_index.get_station_index(), first)
+
+    def test_price_refresh_rebuilds_index_and_tiles(self):
+        with override_settings(ROUTE_PLANNER_STATION_CHECK_INTERVAL=0):
+            first = station_index.get_station_index()
+            FuelStation.objects.filter(id=1).update(retail_price=Decimal('2.99'))
+            make_station(2, 35.1, -100.1, 3.10, save=True)
+
+            second = station_index.get_station_index()
+
+        self.assertIsNot(second, first)
+        self.assertNotEqual(second.version, first.version)
+        self.assertEqual(len(second), 2)
+        self.assertEqual(second.tiles.stats()['station_count'], 2)
+        self.assertEqual(second.prices.tolist(), [2.99, 3.10])
+
+    def test_moved_station_rebuilds_index_and_tiles(self):
+        with override_settings(ROUTE_PLANNER_STATION_CHECK_INTERVAL=0):
+            first = station_index.get_station_index()
+            FuelStation.objects.filter(id=1).update(latitude=Decimal('36.0'), longitude=Decimal('-101.0'))
+
+            second = station_index.get_station_index()
+
+        self.assertIsNot(second, first)
+        self.assertNotEqual(second.version, first.version)
+        self.assertEqual(second.latitudes.tolist(), [36.0])
+        self.assertEqual(list(second.tiles.tiles), [(144, -404)])
+
+    def test_changes_are_not_checked_within_the_interval(self):
+        with override_settings(ROUTE_PLANNER_STATION_CHECK_INTERVAL=3600):
+            first = station_index.get_station_index()
+            make_station(2, 35.1, -100.1, 3.10, save=True)
+            self.assertIs(station_index.get_station_index(), first)
+
+
+class PreloadTests(TestCase):
+    def setUp(self):
+        station_index.reset_station_index()
+        self.addCleanup(station_index.reset_station_index)
+        make_station(1, 35.0, -100.0, 3.50, save=True)
+
+    def test_request_modules_do_not_import_heavy_dependencies(self):
+        # rest_framework imports requests if it can, so the heavy modules are
+        # blocked rather than looked for: a top-level import of one fails
+        code = (
+            "import sys; heavy = ('folium', 'geopy', 'requests'); sys.modules.update(dict.fromkeys(heavy)); "
+            "import django; django.setup(); "
+            "import route_planner.views, route_planner.services.routing; "
+            "print(sorted(m for m in heavy if sys.modules[m] is not None))"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='api.settings', ROUTE_PLANNER_PRELOAD='0')
+        output = subprocess.run(
+            [sys.executable, '-c', code], env=env, cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        self.assertEqual(output.strip(), '[]')
+
+    @mock.patch('gc.freeze')
+    def test_preload_builds_the_index_and_closes_connections(self, freeze):
+        with mock.patch('django.db.connections.close_all') as close_all:
+            station_index.preload()
+
+        self.assertEqual(len(station_index.get_station_index()), 1)
+        close_all.assert_called_once_with()
+        freeze.assert_called_once_with()
+
+    @mock.patch('gc.freeze')
+    def test_preload_survives_a_missing_road_graph(self, freeze):
+        missing = os.path.join(tempfile.mkdtemp(), 'road_graph.npz')
+        with override_settings(ROUTE_PLANNER_ROUTING_BACKEND='road_graph', ROUTE_PLANNER_ROAD_GRAPH=missing), \
+                mock.patch.object(routing_backends, '_backend', None), \
+                mock.patch('django.db.connections.close_all') as close_all, \
+                self.assertLogs('route_planner.services.station_index', 'WARNING') as logs:
+            station_index.preload()
+            self.assertIsNone(routing_backends._backend)
+
+        self.assertIn('Routing backend preload skipped', logs.output[0])
+        close_all.assert_called_once_with()
+        freeze.assert_called_once_with()
+
+
+class MatchedEncodingsTests(SimpleTestCase):
+    def test_matches(self):
+        cases = {
+            '"abc"': ('identity',),
+            'W/"abc"': ('identity',),
+            '*': http_cache.SUPPORTED_ENCODINGS,
+            '"other", "abc"': ('identity',),
+            '"abc-gzip"': ('gzip',),
+            ' W/"abc-gzip" , "abc"': ('gzip', 'identity'),
+        }
+        for header, encodings in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(http_cache.matched_encodings(header, 'abc'), encodings)
+
+    def test_does_not_match(self):
+        for header in (None, '', '"abcd"', '"other", "xyz-gzip"', '"ab-c"', '"abc-deflate"', '"abc-identity"'):
+            with self.subTest(header=header):
+                self.assertEqual(http_cache.matched_encodings(header, 'abc'), ())
+
+    def test_header_names_the_coding(self):
+        self.assertEqual(http_cache.etag_header('abc', 'identity'), '"abc"')
+        self.assertEqual(http_cache.etag_header('abc', 'gzip'), '"abc-gzip"')
+
+
+class NegotiateEncodingTests(SimpleTestCase):
+    available = ('identity', 'gzip', 'br')
+
+    def test_prefers_brotli_on_equal_quality(self):
+        self.assertEqual(http_cache.negotiate_encoding('gzip, deflate, br', self.available), 'br')
+
+    def test_quality_values(self):
+        self.assertEqual(http_cache.negotiate_encoding('gzip;q=1, br;q=0.5', self.available), 'gzip')
+        self.assertEqual(http_cache.negotiate_encoding('gzip;q=0.2, br;q=0.8', self.available), 'br')
+
+    def test_zero_quality_refuses_a_coding(self):
+        self.assertEqual(http_cache.negotiate_encoding('gzip;q=0', self.available), 'identity')
+        self.assertEqual(http_cache.negotiate_encoding('*;q=0.5, br;q=0', self.available), 'gzip')
+
+    def test_wildcard(self):
+        self.assertEqual(http_cache.negotiate_encoding('*', ('identity', 'gzip')), 'gzip')
+
+    def test_only_available_codings(self):
+        self.assertEqual(http_cache.negotiate_encoding('br', ('identity', 'gzip')), 'identity')
+        self.assertEqual(http_cache.negotiate_encoding('', self.available), 'identity')
+
+
+def fake_plan():
+    route = [(35.0 + i / 100, -100.0 + i / 100) for i in range(300)]
+    return {
+        'route': route,
+        'distance': 300.0,
+        'fuel_stops': [],
+        'total_cost': Decimal('0.00'),
+    }
+
+
+@mock.patch('route_planner.services.map_visualizer.MapVisualizer.create_map', return_value='http://testserver/map.html')
+@mock.patch.object(RoutePlanner, 'plan_route', side_effect=lambda: fake_plan())
+class RouteGetViewTests(TestCase):
+    url = '/api/route'
+    params = {'start_location': 'Dallas, TX', 'end_location': 'Denver, CO'}
+
+    def setUp(self):
+        cache.clear()
+        station_index.reset_station_index()
+        self.addCleanup(station_index.reset_station_index)
+
+    def test_first_get_is_cacheable(self, plan_route, create_map):
+        response = self.client.get(self.url, self.params)
+
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertRegex(etag, r'^"[0-9a-f]{32}"$')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn(f'max-age={http_cache.PLAN_MAX_AGE}', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(response.content)['data']['map_url'], 'http://testserver/map.html')
+        # the map file is named after the plan, so every worker sends the same body
+        create_map.assert_called_once_with(etag.strip('"'))
+
+    def test_if_none_match_is_answered_without_planning(self, plan_route, create_map):
+        etag = self.client.get(self.url, self.params)['ETag']
+
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(plan_route.call_count, 1)
+
+    def test_equivalent_queries_share_the_etag(self, plan_route, create_map):
+        etag = self.client.get(self.url, self.params)['ETag']
+        response = self.client.get(
+            self.url, {'start_location': '  dallas,   tx ', 'end_location': 'DENVER, CO'}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_price_refresh_changes_the_etag(self, plan_route, create_map):
+        with override_settings(ROUTE_PLANNER_STATION_CHECK_INTERVAL=0):
+            etag = self.client.get(self.url, self.params)['ETag']
+            make_station(1, 35.0, -100.0, 3.50, save=True)
+
+            response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(plan_route.call_count, 2)
+
+    def test_content_encoding_follows_negotiation(self, plan_route, create_map):
+        response = self.client.get(self.url, self.params, HTTP_ACCEPT_ENCODING='gzip;q=1, br;q=0')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].endswith('-gzip"'))
+        self.assertEqual(json.loads(gzip.decompress(response.content))['status'], 'success')
+
+        identity = self.client.get(self.url, self.params, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(identity.has_header('Content-Encoding'))
+        self.assertEqual(gzip.decompress(response.content), identity.content)
+
+    def test_not_modified_names_a_stored_representation(self, plan_route, create_map):
+        etag = self.client.get(self.url, self.params)['ETag']
+        with mock.patch.object(http_cache, 'encode_plan', side_effect=lambda body: {'identity': b'{}'}):
+            cache.clear()
+            self.client.get(self.url, self.params)
+
+            response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_not_modified_reads_only_the_codings(self, plan_route, create_map):
+        etag = self.client.get(self.url, self.params, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+
+        with mock.patch.object(cache, 'get', wraps=cache.get) as cache_get:
+            response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        keys = [call.args[0] for call in cache_get.call_args_list if call.args[0].startswith('plan_')]
+        self.assertEqual(len(keys), 1)
+        self.assertTrue(keys[0].endswith('_codings'))
+
+    def test_ok_reads_only_the_body_it_sends(self, plan_route, create_map):
+        self.client.get(self.url, self.params)
+
+        with mock.patch.object(cache, 'get', wraps=cache.get) as cache_get:
+            response = self.client.get(self.url, self.params, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        keys = [call.args[0] for call in cache_get.call_args_list if call.args[0].startswith('plan_')]
+        self.assertEqual([key.rsplit('_', 1)[1] for key in keys], ['codings', 'gzip'])
+
+    def test_not_modified_without_stored_plan_echoes_the_matched_coding(self, plan_route, create_map):
+        etag = self.client.get(self.url, self.params, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        self.assertTrue(etag.endswith('-gzip"'))
+        cache.clear()
+
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(plan_route.call_count, 1)
+
+    def test_representation_the_client_lacks_is_sent(self, plan_route, create_map):
+        etag = self.client.get(self.url, self.params, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING='identity')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag.replace('-gzip', ''))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_plan_is_compressed_once(self, plan_route, create_map):
+        with mock.patch.object(http_cache, 'encode_plan', wraps=http_cache.encode_plan) as encode_plan:
+            for accept_encoding in ('gzip', 'identity', 'gzip', 'br, gzip'):
+                self.client.get(self.url, self.params, HTTP_ACCEPT_ENCODING=accept_encoding)
+
+        self.assertEqual(encode_plan.call_count, 1)
+        self.assertEqual(plan_route.call_count, 1)
+
+    def test_backend_error_is_reported_like_post(self, plan_route, create_map):
+        missing = os.path.join(tempfile.mkdtemp(), 'road_graph.npz')
+        with override_settings(ROUTE_PLANNER_ROUTING_BACKEND='road_graph', ROUTE_PLANNER_ROAD_GRAPH=missing), \
+                mock.patch.object(routing_backends, '_backend', None):
+            get = self.client.get(self.url, self.params)
+            post = self.client.post(self.url, self.params, content_type='application/json')
+
+        for response in (get, post):
+            self.assertEqual(response.status_code, 500)
+            self.assertIn('error', json.loads(response.content))
+        plan_route.assert_not_called()
+
+    def test_missing_parameter(self, plan_route, create_map):
+        response = self.client.get(self.url, {'start_location': 'Dallas, TX'})
+        self.assertEqual(response.status_code, 400)
+        plan_route.assert_not_called()
+
+
+class FuelPlanSweepTests(TestCase):
+    tank_ranges = [300.0, 450.0, 600.0]
+    mpgs = [6.0, 9.0, 12.0]
+
+    def setUp(self):
+        station_index.reset_station_index()
+        self.addCleanup(station_index.reset_station_index)
+        # stations every half degree along a west-east trip, prices going up and down
+        for i in range(76):
+            make_station(i + 1, 35.1 if i % 2 else 34.9, -118.0 + i / 2, 3.0 + (i * 37 % 11) / 10, save=True)
+
+        points = [(35.0, -118.0 + i * 38 / 400) for i in range(401)]
+        distance = sum(RoutePlanner('A', 'B').route_segment_distances(points))
+        self.route = {'route': {'distance': distance, 'shape': {'shapePoints': points}}}
+
+        patcher = mock.patch.object(RoutePlanner, 'get_route', return_value=self.route)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def plan(self, tank_range, mpg):
+        planner = RoutePlanner('A', 'B', tank_range=tank_range, mpg=mpg)
+        points = self.route['route']['shape']['shapePoints']
+        distance = self.route['route']['distance']
+        stops = planner.optimize_fuel_stops(distance, planner.find_stations_near_route(points, distance))
+        return stops, planner.calculate_total_cost(stops)
+
+    def test_every_cell_matches_a_separate_plan(self):
+        result = FuelPlanSweep('A', 'B', self.tank_ranges, self.mpgs).run()
+
+        self.assertEqual(len(result['scenarios']), 9)
+        for row, tank_range in enumerate(self.tank_ranges):
+            for column, mpg in enumerate(self.mpgs):
+                with self.subTest(tank_range=tank_range, mpg=mpg):
+                    stops, total_cost = self.plan(tank_range, mpg)
+                    scenario = result['scenarios'][row * len(self.mpgs) + column]
+
+                    self.assertGreater(len(stops), 0)
+                    self.assertEqual(result['total_cost'][row][column], total_cost)
+                    self.assertEqual(scenario['total_cost'], total_cost)
+                    self.assertEqual((scenario['tank_range'], scenario['mpg']), (tank_range, mpg))
+                    self.assertEqual(len(scenario['fuel_stops']), len(stops))
+                    for sweep_stop, stop in zip(scenario['fuel_stops'], stops):
+                        self.assertEqual(list(sweep_stop), list(stop))
+                        self.assertEqual(sweep_stop['station']['id'], stop['station']['id'])
+                        self.assertEqual(sweep_stop['cost'], stop['cost'])
+                        self.assertAlmostEqual(sweep_stop['total_fuel'], stop['total_fuel'])
+
+
+class BestStationNearTests(TestCase):
+    """The tile search must pick exactly what an exhaustive geodesic search picks"""
+    max_distance = 30.0
+
+    def setUp(self):
+        station_index.reset_station_index()
+        self.addCleanup(station_index.reset_station_index)
+        self.planner = RoutePlanner('A', 'B')
+
+    def brute_force(self, point):
+        best = None
+        for station in FuelStation.objects.order_by('id'):
+            distance = geodesic(point, (station.latitude, station.longitude)).miles
+            if distance <= self.max_distance and (best is None or station.retail_price < best[0].retail_price):
+                best = (station, distance)
+        return best
+
+    def assert_same_as_brute_force(self, point):
+        expected = self.brute_force(point)
+        found = self.planner.best_station_near(point, 100.0, self.max_distance)
+        if expected is None:
+            self.assertIsNone(found)
+        else:
+            self.assertIsNotNone(found)
+            self.assertEqual(found.id, expected[0].id)
+            self.assertAlmostEqual(found.distance_from_start, 100.0 + expected[1])
+        return found
+
+    def test_random_stations_and_tile_corner_points(self):
+        rng = random.Random(7)
+        # few distinct prices so ties are frequent
+        for pk in range(1, 301):
+            make_station(pk, round(rng.uniform(34.0, 36.0), 6), round(rng.uniform(-101.0, -99.0), 6),
+                         rng.choice([3.0, 3.05, 3.1, 3.15, 3.2]), save=True)
+
+        points = [(rng.uniform(33.8, 36.2), rng.uniform(-101.2, -98.8)) for _ in range(40)]
+        # exactly on tile corners and edges
+        points += [(35.0, -100.0), (34.75, -99.5), (35.25, -100.125), (35.125, -100.25), (34.5, -100.0000001)]
+        for point in points:
+            with self.subTest(point=point):
+                self.assert_same_as_brute_force(point)
+
+    def test_equal_prices_in_different_tiles_pick_the_lowest_id(self):
+        # id 2 sits in the southern tile, which is visited first
+        make_station(2, 35.10, -100.10, 3.00, save=True)
+        make_station(1, 35.40, -100.10, 3.00, save=True)
+        make_station(3, 35.20, -100.05, 3.50, save=True)
+
+        found = self.assert_same_as_brute_force((35.25, -100.10))
+        self.assertEqual(found.id, 1)
+
+    def test_dominated_station_of_an_inside_tile_is_skipped(self):
+        # tile (140, -401) spans 35.0-35.25 / -100.25--100.0, the query is at its centre
+        make_station(1, 35.12, -100.03, 3.50, save=True)
+        # cheaper, 2.8 miles away, in the next tile to the east
+        make_station(2, 35.12, -99.98, 3.00, save=True)
+
+        index = station_index.get_station_index()
+        tile = index.tiles.tiles[(140, -401)]
+        self.assertEqual(tile.stations.tolist(), [0])
+        self.assertEqual(tile.frontier.tolist(), [])
+        candidates = dict(((t.row, t.col), c.tolist()) for t, c in index.tiles.candidates(35.125, -100.125, self.max_distance))
+        self.assertEqual(candidates[(140, -401)], [])
+
+        found = self.assert_same_as_brute_force((35.125, -100.125))
+        self.assertEqual(found.id, 2)
+
+    def test_dominated_station_is_kept_when_its_dominator_is_out_of_range(self):
+        make_station(1, 35.12, -100.12, 3.50, save=True)
+        make_station(2, 35.12, -100.04, 3.00, save=True)
+
+        # station 1 is 4.5 miles from the cheaper station 2, but from here station 1
+        # is 28.3 miles away and station 2 is 32.9, beyond the 30 mile radius
+        found = self.assert_same_as_brute_force((35.12, -100.62))
+        self.assertEqual(found.id, 1)
+
+    def test_no_station_in_range(self):
+        make_station(1, 35.0, -100.0, 3.0, save=True)
+        self.assertIsNone(self.assert_same_as_brute_force((36.0, -100.0)))
+
+
+class StationTilesViewTests(TestCase):
+    def setUp(self):
+        station_index.reset_station_index()
+        self.addCleanup(station_index.reset_station_index)
+        make_station(1, 35.1, -100.1, 3.50, save=True)
+        make_station(2, 35.2, -100.2, 3.00, save=True)
+
+    def test_statistics_follow_a_price_refresh(self):
+        with override_settings(ROUTE_PLANNER_STATION_CHECK_INTERVAL=0):
+            before = json.loads(self.client.get('/api/stations/tiles').content)['data']
+            FuelStation.objects.filter(id=2).update(retail_price=Decimal('2.50'))
+            after = json.loads(self.client.get('/api/stations/tiles').content)['data']
+
+        self.assertEqual(before['station_count'], 2)
+        self.assertEqual(before['tiles'][0]['min_price'], 3.0)
+        self.assertEqual(after['tiles'][0]['min_price'], 2.5)
+        self.assertNotEqual(after['version'], before['version'])
+
+
+def road(*coordinates, oneway=False):
+    """GeoJSON feature of a road through (lon, lat) coordinates"""
+    return {
+        'type': 'Feature',
+        'properties': {'oneway': oneway},
+        'geometry': {'type': 'LineString', 'coordinates': [list(c) for c in coordinates]},
+    }
+
+
+# A(-100, 35)  B(-99, 35)  C(-98, 35)  D(-99, 36)  E(-99, 34), one-way D -> C,
+# and a separate road F-G that nothing else reaches
+ROADS = {
+    'type': 'FeatureCollection',
+    'features': [
+        road((-100, 35), (-99, 35)),
+        road((-100, 35), (-99, 36)),
+        road((-99, 36), (-98, 35), oneway=True),
+        road((-99, 35), (-99, 34), (-98, 35)),
+        {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Point', 'coordinates': [-97, 35]}},
+        {'type': 'Feature', 'properties': {}, 'geometry': {
+            'type': 'MultiLineString', 'coordinates': [[[-80, 40], [-80.5, 40.5]]]}},
+    ],
+}
+
+
+def dijkstra(graph, source, target):
+    distances = {source: 0.0}
+    heap = [(0.0, source)]
+    done = set()
+    while heap:
+        distance, v = heapq.heappop(heap)
+        if v == target:
+            return distance
+        if v in done:
+            continue
+        done.add(v)
+        for slot in range(graph.indptr[v], graph.indptr[v + 1]):
+            w, length = int(graph.indices[slot]), float(graph.lengths[slot])
+            if distance + length < distances.get(w, math.inf):
+                distances[w] = distance + length
+                heapq.heappush(heap, (distance + length, w))
+    return None
+
+
+def path_length(graph, path):
+    total = 0.0
+    for v, w in zip(path, path[1:]):
+        slots = range(graph.indptr[v], graph.indptr[v + 1])
+        total += min(float(graph.lengths[s]) for s in slots if graph.indices[s] == w)
+    return total
+
+
+class RoadGraphTests(SimpleTestCase):
+    def setUp(self):
+        self.graph = RoadGraph.from_geojson(ROADS)
+
+    def node(self, lon, lat):
+        node, gap = self.graph.nearest_node(lat, lon)
+        self.assertEqual(gap, 0.0)
+        return node
+
+    def test_from_geojson(self):
+        # A B C D E F G, the Point feature is ignored
+        self.assertEqual(len(self.graph), 7)
+        # 5 two-way segments and 1 one-way segment
+        self.assertEqual(len(self.graph.indices), 11)
+
+    def test_one_way_edge(self):
+        a, c, d = self.node(-100, 35), self.node(-98, 35), self.node(-99, 36)
+
+        length, path = self.graph.shortest_path(a, c)
+        self.assertEqual(path, [a, d, c])
+        self.assertAlmostEqual(length, dijkstra(self.graph, a, c))
+
+        # D -> C cannot be driven backwards, so the way back goes through E and B
+        length, path = self.graph.shortest_path(c, a)
+        self.assertEqual(path, [c, self.node(-99, 34), self.node(-99, 35), a])
+        self.assertAlmostEqual(length, dijkstra(self.graph, c, a))
+
+    def test_unreachable_target(self):
+        with self.assertRaises(ValueError):
+            self.graph.shortest_path(self.node(-100, 35), self.node(-80, 40))
+
+    def test_source_is_target(self):
+        a = self.node(-100, 35)
+        self.assertEqual(self.graph.shortest_path(a, a), (0.0, [a]))
+
+    def test_matches_dijkstra_on_a_random_network(self):
+        rng = random.Random(11)
+        points = {
+            (i, j): (-104 + j / 2 + rng.uniform(-0.1, 0.1), 33 + i / 2 + rng.uniform(-0.1, 0.1))
+            for i in range(12) for j in range(16)
+        }
+        features = [
+            road(points[(i, j)], points[(i + di, j + dj)], oneway=rng.random() < 0.15)
+            for (i, j) in points
+            for di, dj in ((0, 1), (1, 0), (1, 1))
+            if (i + di, j + dj) in points and rng.random() < 0.75
+        ]
+        graph = RoadGraph.from_geojson({'type': 'FeatureCollection', 'features': features})
+
+        for _ in range(80):
+            source, target = rng.randrange(len(graph)), rng.randrange(len(graph))
+            expected = dijkstra(graph, source, target)
+            with self.subTest(source=source, target=target):
+                if expected is None:
+                    with self.assertRaises(ValueError):
+                        graph.shortest_path(source, target)
+                    continue
+                length, path = graph.shortest_path(source, target)
+                self.assertAlmostEqual(length, expected, places=9)
+                self.assertEqual((path[0], path[-1]), (source, target))
+                self.assertAlmostEqual(path_length(graph, path), length, places=9)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'roads.npz')
+            self.graph.save(path)
+            loaded = RoadGraph.load(path)
+
+        self.assertEqual(loaded.indices.tolist(), self.graph.indices.tolist())
+        self.assertEqual(loaded.lengths.tolist(), self.graph.lengths.tolist())
+        self.assertEqual(loaded.reverse_indices.tolist(), self.graph.reverse_indices.tolist())
+
+
+class RoadGraphBackendTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'roads.npz')
+        RoadGraph.from_geojson(ROADS).save(path)
+        self.backend = RoadGraphBackend(path)
+
+    def test_route_shape(self):
+        start, end = (35.01, -100.0), (35.0, -97.99)
+        route = self.backend.route(start, end)
+
+        self.assertEqual(set(route), {'distance', 'shapePoints'})
+        self.assertEqual(route['shapePoints'], [start, (35.0, -100.0), (36.0, -99.0), (35.0, -98.0), end])
+        graph = self.backend.graph
+        gaps = graph.nearest_node(*start)[1] + graph.nearest_node(*end)[1]
+        path = [graph.nearest_node(lat, lon)[0] for lat, lon in route['shapePoints'][1:-1]]
+        self.assertAlmostEqual(route['distance'], path_length(graph, path) + gaps)
+
+    def test_unreachable_destination(self):
+        with self.assertRaises(ValueError):
+            self.backend.route((35.0, -100.0), (40.0, -80.0))
+
+    def test_backend_without_route_cannot_be_created(self):
+        class Incomplete(RoutingBackend):
+            name = 'incomplete'
+
+        with self.assertRaises(TypeError):
+            Incomplete()
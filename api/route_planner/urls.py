@@ -1,10 +1,18 @@
 from django.urls import include, path
-from .views import RoutePlannerView, RouteMapView
+from .views import RoutePlannerView, RouteMapView, RouteSweepView, StationTilesView
 
 urlpatterns = [
     path(
         'route',
         RoutePlannerView.as_view(),
         name='route_plan'),
+    path(
+        'route/sweep',
+        RouteSweepView.as_view(),
+        name='route_sweep'),
+    path(
+        'stations/tiles',
+        StationTilesView.as_view(),
+        name='station_tiles'),
 
         ]
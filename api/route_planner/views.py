@@ -1,9 +1,13 @@
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
-from route_planner.services.map_visualizer import MapVisualizer
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from rest_framework.views import APIView
-from route_planner.serializers import RouteRequestSerializer, RouteResponseSerializer
+from route_planner.serializers import RouteRequestSerializer, RouteResponseSerializer, RouteSweepRequestSerializer
+from route_planner.services import http_cache
 from route_planner.services.routing import RoutePlanner
+from route_planner.services.station_index import get_station_index
+from route_planner.services.sweep import FuelPlanSweep
 from rest_framework import status
 from django.views.generic import TemplateView
 
@@ -13,33 +17,137 @@ class RouteMapView(TemplateView):
     template_name = 'route_map.html'
 
 class RoutePlannerView(APIView):
+    def plan(self, start_location, end_location, map_name=None):
+        """
+        Plans the route and returns the response body with its status code
+        map_name: fixed map file name, so that the same plan always gives the same body
+        """
+        try:
+            planner = RoutePlanner(
+                start_location=start_location,
+                end_location=end_location
+            )
+            route_data = planner.plan_route()
+
+            response_serializer = RouteResponseSerializer(data=route_data)
+            if response_serializer.is_valid():
+
+                # create route map (folium is heavy, import it on first use)
+                from route_planner.services.map_visualizer import MapVisualizer
+                visualizer = MapVisualizer(response_serializer.data['route'], response_serializer.data['fuel_stops'])
+                map_url = visualizer.create_map(map_name)
+
+
+                return {
+                    'status': 'success',
+                    'data': {'content': response_serializer.data, 'map_url': map_url}
+                }, status.HTTP_200_OK
+            return response_serializer.errors, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        except Exception as e:
+            return {'error': str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    def get(self, request):
+        """
+        Cacheable form of the planner: /route?start_location=...&end_location=...
+        Answers If-None-Match with 304 without planning, and serves the plan
+        gzip/brotli encoded from bodies compressed once when it was cached.
+        """
+        serializer = RouteRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        start_location = http_cache.normalize_location(serializer.validated_data['start_location'])
+        end_location = http_cache.normalize_location(serializer.validated_data['end_location'])
+        try:
+            etag = http_cache.plan_etag(start_location, end_location)
+        except Exception as e:
+            # same answer as a failed plan, e.g. a routing backend that cannot load
+            return JsonResponse({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # the codings a plan was stored with are kept apart from the bodies, so a
+        # revalidation reads a few bytes and a 200 reads only the body it sends
+        codings_key = f"plan_{etag}_codings"
+        codings = cache.get(codings_key)
+        encoding = None
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+        matched = http_cache.matched_encodings(request.META.get('HTTP_IF_NONE_MATCH'), etag)
+        if codings:
+            encoding = http_cache.negotiate_encoding(accept_encoding, codings)
+        elif matched:
+            # nothing stored: a 200 would encode again, echo a representation the client holds
+            encoding = http_cache.negotiate_encoding(accept_encoding, matched)
+            if encoding not in matched:
+                encoding = matched[0]
+
+        # 304 only when the client holds the representation a 200 would send
+        if encoding in matched:
+            return self.cacheable(HttpResponse(status=status.HTTP_304_NOT_MODIFIED), etag, encoding)
+
+        body = cache.get(f"plan_{etag}_{encoding}") if codings else None
+        if body is None:
+            payload, status_code = self.plan(start_location, end_location, map_name=etag)
+            if status_code != status.HTTP_200_OK:
+                return JsonResponse(payload, status=status_code)
+            bodies = http_cache.encode_plan(payload)
+            cache.set_many({f"plan_{etag}_{coding}": data for coding, data in bodies.items()}, http_cache.PLAN_MAX_AGE)
+            cache.set(codings_key, tuple(bodies), http_cache.PLAN_MAX_AGE)
+            encoding = http_cache.negotiate_encoding(accept_encoding, bodies)
+            body = bodies[encoding]
+
+        response = HttpResponse(body, content_type='application/json')
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        return self.cacheable(response, etag, encoding)
+
+    def cacheable(self, response, etag, encoding):
+        response['ETag'] = http_cache.etag_header(etag, encoding)
+        patch_cache_control(response, public=True, max_age=http_cache.PLAN_MAX_AGE)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
     def post(self, request):
         serializer = RouteRequestSerializer(data=request.data)
         if serializer.is_valid():
-            try: 
-                planner = RoutePlanner(
+            body, status_code = self.plan(
+                serializer.validated_data['start_location'],
+                serializer.validated_data['end_location']
+            )
+            return JsonResponse(body, status=status_code)
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class RouteSweepView(APIView):
+    def post(self, request):
+        """Fuel cost of one trip for every combination of tank_ranges and mpgs"""
+        serializer = RouteSweepRequestSerializer(data=request.data)
+        if serializer.is_valid():
+            try:
+                sweep = FuelPlanSweep(
                     start_location=serializer.validated_data['start_location'],
-                    end_location=serializer.validated_data['end_location']
+                    end_location=serializer.validated_data['end_location'],
+                    tank_ranges=serializer.validated_data['tank_ranges'],
+                    mpgs=serializer.validated_data['mpgs']
                 )
-                route_data = planner.plan_route()
-
-                response_serializer = RouteResponseSerializer(data=route_data)
-                if response_serializer.is_valid():
-                    
-                    # create route map
-                    visualizer = MapVisualizer(response_serializer.data['route'], response_serializer.data['fuel_stops'])
-                    map_url = visualizer.create_map()
-                    
-                    
-                    return JsonResponse({
-                        'status': 'success',
-                        'data': {'content': response_serializer.data, 'map_url': map_url}
-                    },  status=status.HTTP_200_OK)
-                return JsonResponse(response_serializer.errors, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
+                return JsonResponse({
+                    'status': 'success',
+                    'data': {'content': sweep.run()}
+                }, status=status.HTTP_200_OK)
+
             except Exception as e:
                 return JsonResponse(
                     {'error': str(e)},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
-        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class StationTilesView(APIView):
+    def get(self, request):
+        """Read-only price tile statistics of the loaded station data (for ops)"""
+        station_index = get_station_index()
+        return JsonResponse({
+            'status': 'success',
+            'data': {'version': station_index.version, **station_index.tiles.stats()}
+        }, status=status.HTTP_200_OK)